@@ -3,6 +3,7 @@ Contains utilities for the automatic download of NUTS files.
 """
 
 import os
+import shutil
 import urllib.request
 
 
@@ -34,9 +35,10 @@ def get_NUTS_url(geomtype="RG", scale=1, year=2021, format="geojson", epsg=4326,
 def download_NUTS(datadir, filename=None, scale=1, year=2021, epsg=4326):
     """
     Download a NUTS file from the Eurostat API and save to file.
+    The file is streamed to disk in chunks of 1 MB, instead of being held in memory as a whole.
     """
     filename_NUTS, url = get_NUTS_url(scale=scale, year=year, epsg=epsg)
     with urllib.request.urlopen(url) as resp:
         with open(file := os.path.join(datadir, filename or filename_NUTS), "wb") as f:
-            f.write(resp.read())
+            shutil.copyfileobj(resp, f, length=1 << 20)
     return file
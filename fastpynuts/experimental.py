@@ -5,8 +5,13 @@ experimental purposes.
 
 import time
 
-from shapely import intersects_xy
-from treelib import Tree
+import numpy as np
+from shapely import Point, intersects_xy
+
+try:
+    from rtree import index
+except ImportError:
+    index = None
 
 from .fastpynuts import NUTSfinder
 
@@ -23,8 +28,12 @@ class NUTSfinderBenchmark(NUTSfinder):
     level 1 are checked, etc. At each level, region candidates are determined by a fast R-tree test, followed by a point-in-polygon check of the candidates.
 
     **rtree**:
-    A single R-tree is constructed for all regions, independent of level. Region candidates are then determined by the R-tree's `intersect()` method,
-    followed by a point-in-polygon check of the candidates.
+    A single R-tree (`shapely.STRtree`) is constructed for all regions, independent of level. Region candidates are then determined by the R-tree's
+    `query()` method, followed by a point-in-polygon check of the candidates.
+
+    **soa**:
+    The regions' bounding boxes are stored as contiguous arrays (structure of arrays). Region candidates are determined by a single vectorized
+    point-in-bbox test against all bounding boxes, followed by a point-in-polygon check of the candidates.
 
     **bbox**:
     Sequentially performs a point-in-bbox test of all regions, followed by a point-in-polygon check of the candidates.
@@ -32,14 +41,34 @@ class NUTSfinderBenchmark(NUTSfinder):
     **poly**:
     Sequentially performs a point-in-polygon test of all regions.
 
+    The variants **rtree_obj** and **tree_rtree_obj** embed the region objects in the nodes of `rtree` (libspatialindex) trees
+    and are only available if the optional dependency `rtree` is installed.
+
     """
-    def __init__(self, geojsonfile, buffer_geoms=0, min_level=0, max_level=3):
-        super().__init__(geojsonfile, buffer_geoms, min_level, max_level)
+    def __init__(self, geojsonfile, buffer_geoms=0, min_level=0, max_level=3, cache=False, find_cache_size=0):
+        super().__init__(geojsonfile, buffer_geoms, min_level, max_level, cache, find_cache_size)
 
         # construct additional trees
         self.tree_rtree = self._construct_tree_rtree(self.regions)
-        self.tree_rtree_obj = self._construct_tree_rtree_obj(self.regions)
-        self.rtree_obj = self._construct_rtree(self.regions, embed_obj=True)
+
+        # resolve the finding methods once instead of on every call
+        self._find_dispatch = {
+            "tree": self._find_tree,
+            "tree_rtree": self._find_tree_rtree,
+            "rtree": self._find_rtree,
+            "soa": self._find_soa,
+            "bbox": self._find_bbox,
+            "poly": self._find_poly,
+        }
+
+        # the variants embedding the region objects rely on `rtree` (libspatialindex)
+        if index is not None:
+            self.tree_rtree_obj = self._construct_tree_rtree_obj(self.regions)
+            self.rtree_obj = self._construct_rtree_index(self.regions, embed_obj=True)
+            self._find_dispatch.update({
+                "tree_rtree_obj": self._find_tree_rtree_obj,
+                "rtree_obj": self._find_rtree_obj,
+            })
 
 
     def find(self, lon, lat, method="tree", valid_point=False, verbose=False, **kwargs):
@@ -47,111 +76,85 @@ class NUTSfinderBenchmark(NUTSfinder):
         Find a point's NUTS regions by longitude and latitude.
         For large-scale applications, if it is known, that the point corresponds to a valid location within the NUTS regions, use `valid_point = True` for a speedup.
         """
-        find_ = getattr(self, f"_find_{method}")
+        find_ = self._find_dispatch.get(method)
+        if find_ is None:
+            if method in ("rtree_obj", "tree_rtree_obj"):
+                raise ImportError(f"method '{method}' requires the optional dependency rtree (pip install fastpynuts[benchmark])")
+            raise ValueError(f"Unknown method '{method}', must be one of {list(self._find_dispatch)}")
+        if not verbose: return sorted(find_(lon, lat, self.regions, valid_point=valid_point, **kwargs))
+
         t0 = time.time()
         results = find_(lon, lat, self.regions, valid_point=valid_point, **kwargs)
         t1 = time.time()
-        if verbose: print(f"find_{method} took {t1-t0} s")
+        print(f"find_{method} took {t1-t0} s")
         return sorted(results)
 
 
     # constructing trees
-    # def _create_dict_tree(ids, cumul=""):
-    #     if len(ids) == 1: return {cumul + ids[0]: None}
-    #     for id in ids:
-    #         return {cumul + id: _create_dict_tree(ids[1:], cumul + id)}
+    def _construct_rtree_index(self, regions, indices=None, embed_obj=False):
+        """
+        Construct a R-tree based on the regions' bounding boxes using `rtree` (libspatialindex), bulk loaded from a stream.
 
+        Indices should refer to the indices of the region objects in `self.regions`. They will be used to retrieve
+        the region objects from the indices returned by `rtree.index.Index.intersection()`.
 
-    # for key in keys:
-    #     ids = [key[:2], *key[2:]]
-    #     new = create_tree(ids)
-    #     print(new)
-    #     d.update(new)
+        Optionally embed the region objects in the rtree nodes. This has negative runtime implications.
+        """
+        if not regions: return index.Index()
+        stream = ((i, region.bbox, region if embed_obj else None) for i, region in zip(indices or range(len(regions)), regions))
+        return index.Index(stream)
 
     def _construct_tree_rtree(self, regions):
-        """Construct a tree, whose nodes contain R-Tree objects. This way, the hierarchical structure of the NUTS regions can be exploited."""
-
-        # initially construct tree
-        tree = Tree()
-        tree.create_node(tag="NUTS", identifier="root")
-        for i, region in enumerate(regions):
-            if region.level == 0:
-                tree.create_node(tag=str(region), identifier=region.id, parent="root", data=region)
-            else:
-                parent = region.id[:-1]
-                tree.create_node(tag=str(region), identifier=region.id, parent=parent, data=region)
-
-        # construct R-tree for each node and insert into regular tree
-        for node_id in tree.expand_tree():
-            node = tree.get_node(node_id)
-            children = tree.children(node_id)
-
-            indices = [self.regions.index(ch.data) for ch in children]
-            rtree = self._construct_rtree([ch.data for ch in children], indices=indices)
-            node.data = rtree
-
+        """
+        Construct a tree, whose nodes contain R-Tree objects of their children. This way, the hierarchical structure of the NUTS regions can be exploited.
+        Each node holds a `shapely.STRtree` of its children's bounding boxes and the children's indices in `self.regions`.
+        """
+        tree = {}
+        for node_id, children in self._children.items():
+            idx = np.array([self._id2idx[child.id] for child in children], dtype=np.intp)
+            tree[node_id] = (self._construct_rtree(self._xmin[idx], self._ymin[idx], self._xmax[idx], self._ymax[idx]), idx)
         return tree
 
     def _construct_tree_rtree_obj(self, regions):
         """Like `_construct_tree_rtree`, but with negative runtime implications due to direct embedding of the region objects."""
-
-        # initially construct tree
-        tree = Tree()
-        tree.create_node(tag="NUTS", identifier="root")
-        for i, region in enumerate(regions):
-            if region.level == 0:
-                tree.create_node(tag=str(region), identifier=region.id, parent="root", data=region)
-            else:
-                parent = region.id[:-1]
-                tree.create_node(tag=str(region), identifier=region.id, parent=parent, data=region)
-
-        # construct R-tree for each node and insert into regular tree
-        for node_id in tree.expand_tree():
-            node = tree.get_node(node_id)
-            children = tree.children(node_id)
-
-            indices = [self.regions.index(ch.data) for ch in children]
-            rtree = self._construct_rtree([ch.data for ch in children], indices=indices, embed_obj=True)
-            node.data = rtree
-
-        return tree
+        return {
+            node_id: self._construct_rtree_index(children, indices=[self._id2idx[child.id] for child in children], embed_obj=True)
+            for node_id, children in self._children.items()
+        }
 
 
     # Finding algorithms
     def _find_poly(self, lon, lat, regions, **kwargs):
-        """Naive sequential implementation, testing every region."""
-        hits = []
-        for region in regions:
-            if intersects_xy(region.geom, lon, lat):
-                hits.append(region)
-        return hits
+        """Naive implementation, testing every region. The point-in-polygon tests of all regions are performed in a single vectorized call."""
+        geoms = [region.geom for region in regions]
+        return [regions[i] for i in np.flatnonzero(intersects_xy(geoms, lon, lat)).tolist()]
 
     def _find_bbox(self, lon, lat, regions, valid_point=False):
         """Bbox test."""
         hits = []
-        for region in regions:
+        for i, region in enumerate(regions):
             xmin, ymin, xmax, ymax = region.bbox
             if (xmin <= lon <= xmax) and (ymin <= lat <= ymax):
-                hits.append(region)
+                hits.append(i)
         hits = self._maybe_validate(lon, lat, hits, valid_point)
 
-        return hits
+        return [regions[i] for i in hits]
 
     def _find_rtree_obj(self, lon, lat, *args, valid_point=False):
         """Find point using a R-tree. Slower variant of `_find_rtree`, due to direct embedding of objects."""
 
         hits = list(self.rtree_obj.intersection((lon, lat, lon, lat), objects="raw"))
-        hits = self._maybe_validate(lon, lat, hits, valid_point)
+        hits = self._maybe_validate(lon, lat, [self._id2idx[hit.id] for hit in hits], valid_point)
 
-        return hits
+        return [self.regions[i] for i in hits]
 
     def _find_tree(self, lon, lat, *args, valid_point=False):
         """Find point fast using a Tree-Bbox-hybrid method."""
         out = []
         current_node = "root"
-        while children := self.tree.children(current_node):
+        while children := self._children.get(current_node):
 
-            hits = self._maybe_validate(lon, lat, [ch.data for ch in children], valid_point, expected_hits=1, validation_method="_find_poly")
+            hits = self._validate_children(lon, lat, children, valid_point)
             out.extend(hits)
 
             if hits:
@@ -165,11 +168,11 @@ class NUTSfinderBenchmark(NUTSfinder):
         """Find point fast using a Tree-Rtree-hybrid method."""
         out = []
         current_node = "root"
-        while children := self.tree_rtree.children(current_node):
+        while node := self.tree_rtree.get(current_node):
 
-            rtree = self.tree_rtree[current_node].data
-            hits = [self.regions[i] for i in rtree.intersection((lon, lat, lon, lat))]
-            hits = self._maybe_validate(lon, lat, hits, valid_point, expected_hits=1, validation_method="_find_poly")
+            rtree, idx = node
+            hits = [self.regions[i] for i in np.sort(idx[rtree.query(Point(lon, lat))]).tolist()]
+            hits = self._validate_children(lon, lat, hits, valid_point)
 
             out.extend(hits)
             if hits:
@@ -183,9 +186,9 @@ class NUTSfinderBenchmark(NUTSfinder):
         """Find point using a Tree-Rtree-hybrid method. Slower variant of `_find_tree_rtree`, due to direct embedding of objects."""
         out = []
         current_node = "root"
-        while self.tree_rtree_obj.children(current_node):
-            hits = list(self.tree_rtree_obj[current_node].data.intersection((lon, lat, lon, lat), objects="raw"))
-            hits = self._maybe_validate(lon, lat, hits, valid_point, expected_hits=1, validation_method="_find_poly")
+        while rtree := self.tree_rtree_obj.get(current_node):
+            hits = list(rtree.intersection((lon, lat, lon, lat), objects="raw"))
+            hits = self._validate_children(lon, lat, hits, valid_point)
 
             out.extend(hits)
             if hits:
@@ -194,3 +197,15 @@ class NUTSfinderBenchmark(NUTSfinder):
                 if valid_point: raise ValueError(f"Could not locate point ({lon}, {lat}) despite `valid_point`=True.")
                 break
         return out
+
+
+    # validation
+    def _validate_children(self, lon, lat, hits, valid_point):
+        """
+        Validate the candidate regions `hits` among the children of a single node. If the point is known to be valid and no buffer is used,
+        exactly one of the non-overlapping children contains the point. Thus, the last candidate is accepted without a point-in-polygon test,
+        if none of the others contains the point.
+        """
+        if self.buffer or not valid_point or len(hits) <= 1:
+            return self._maybe_validate(lon, lat, hits, valid_point, expected_hits=1, validation_method="_find_poly")
+        return self._find_poly(lon, lat, hits[:-1])[:1] or hits[-1:]
@@ -2,26 +2,59 @@
 This submodule defines the core functionality of `fastpynuts`.
 """
 
+import hashlib
 import json
 import os
+import pickle
 import re
+import tempfile
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
 
 import numpy as np
 
-from shapely import Polygon, intersects, intersects_xy, is_geometry
-from rtree import index
-from treelib import Tree
+from shapely import Point, Polygon, STRtree, box, buffer, contains_properly, get_parts, intersects, intersects_xy, is_geometry, points, prepare
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 from .download import download_NUTS
-from .utils import geometry2shapely
+from .utils import geometries2shapely, geometry2shapely
+
+
+# Eurostat's naming convention of NUTS files, e.g. NUTS_RG_01M_2021_4326.geojson
+_NUTS_RE = re.compile(r"NUTS_RG_(\d{1,2})M_(\d+)_(\d+)")
+
+# values of the cells of `NUTSfinder.build_grid`, which do not store a single region
+_GRID_AMBIGUOUS = -1
+_GRID_EMPTY = -2
+
+# format version of the regions cache, to be increased whenever the pickled `NUTSregion` changes
+_CACHE_VERSION = 1
+
 
 class NUTSregion():
     """
     Hold a NUTS region's geometry and bounding box for efficient querying.
     Properties from the NUTS dataset are accessible via the `properties` attribute.
 
+    The most relevant fields are additionally stored as plain attributes:
+    - `id`: the region's ID as specified by the field `NUTS_ID`. E.g. 'DE'
+    - `level`: the region's level as specified by the field `LEVL_CODE`. E.g. 0
+    - `type`: the region's geometry type. Either `'Polygon'` or `'MultiPolygon'`.
+
     """
-    def __init__(self, feature, buffer=None):
+    __slots__ = ("feature", "buffer", "coordinates", "_geom", "bbox", "properties", "id", "level", "type")
+
+    def __init__(self, feature, buffer=None, geom=None):
         """
         Construct a `NUTSregion` from a geojson-like feature like
         ```python
@@ -34,6 +67,7 @@ class NUTSregion():
             'properties': {"NUTS_ID": "DE", ...}
         }
         ```
+        Optionally, the region's `shapely` geometry `geom` (already buffered, if a buffer is given) can be passed if it has already been constructed.
 
         """
         geom_type = feature["geometry"]["type"]
@@ -43,12 +77,15 @@ class NUTSregion():
         self.buffer = buffer
         self.coordinates = feature["geometry"]["coordinates"]
 
-        self.geom = geometry2shapely(feature)
-        if buffer: self.geom = self.geom.buffer(buffer)
-
-        self.bbox = self.geom.bounds
+        # the geometry is only constructed once needed, unless the bbox depends on the buffered geometry
+        self._geom = None if geom is None else self._prepare_geom(geom, None)
+        self.bbox = self.geom.bounds if buffer else self._bbox_from_coordinates(self.coordinates, geom_type)
         self.properties = feature["properties"]
 
+        self.id = self.properties["NUTS_ID"]
+        self.level = self.properties["LEVL_CODE"]
+        self.type = geom_type
+
 
     def __str__(self): return f"NUTS{self.level}: {self.id}"
 
@@ -56,22 +93,35 @@ class NUTSregion():
 
     def __eq__(self, other): return self.id == other.id
 
+    def __hash__(self): return hash(self.id)
+
     def __lt__(self, other): return (self.level < other.level) or (self.level == other.level and self.id < other.id)
 
     @property
-    def id(self) -> str:
-        """The region's ID as specified by the field `NUTS_ID`. E.g. 'DE'"""
-        return self.properties["NUTS_ID"]
+    def geom(self):
+        """The region's `shapely` geometry (buffered, if a buffer is given). It is constructed and prepared on first access."""
+        if self._geom is None:
+            self._geom = self._prepare_geom(geometry2shapely(self.feature), self.buffer)
+        return self._geom
 
-    @property
-    def level(self) -> int:
-        """The region's level as specified by the field `LEVL_CODE`. E.g. 0"""
-        return self.properties["LEVL_CODE"]
+    @staticmethod
+    def _prepare_geom(geom, buffer):
+        if buffer: geom = geom.buffer(buffer)
+        prepare(geom)       # cache GEOS' spatial index of the edges for fast repeated point-in-polygon tests
+        return geom
 
-    @property
-    def type(self) -> str:
-        """The region's feature type as specified by the geometry. Either `'Polygon'` or `'MultiPolygon'`."""
-        return self.feature["type"]
+    @staticmethod
+    def _bbox_from_coordinates(coordinates, geom_type):
+        """Compute the bounding box `(xmin, ymin, xmax, ymax)` directly from the exterior rings' coordinates, without constructing a geometry."""
+        exteriors = [polygon[0] for polygon in coordinates] if geom_type == "MultiPolygon" else [coordinates[0]]
+        coords = np.concatenate([np.asarray(ring, dtype=np.float64) for ring in exteriors])
+        return (*coords.min(axis=0).tolist(), *coords.max(axis=0).tolist())
+
+    def __getstate__(self): return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items(): setattr(self, slot, value)
+        if self._geom is not None: prepare(self._geom)     # the prepared state is lost when pickling
 
     @property
     def __geo_interface__(self) -> dict:
@@ -88,8 +138,16 @@ class NUTSfinder:
     A buffer to the regions may be introduced via the `buffer_geoms` keyword to ensure the correct assignment. On the flip-side,
     a buffer may lead to the assignment of multiple regions for points on the boundary.
 
+    Loading a NUTS file can take several seconds for the high-resolution scales. With `cache=True`, the loaded regions are stored in a
+    cache file in the user's cache directory (`$XDG_CACHE_HOME/fastpynuts`, by default `~/.cache/fastpynuts`), which is reused for
+    subsequent constructions from the same NUTS file with the same settings. The cache file is a pickle, which can execute arbitrary code
+    when loaded, so the cache directory must be trusted. Cache files not owned by the current user are ignored.
+
+    For large numbers of queries, a lookup grid of the regions can be built via `build_grid`. If the same points are queried repeatedly,
+    the results of the last `find_cache_size` distinct queries of `find` can be memoized.
+
     """
-    def __init__(self, geojsonfile, buffer_geoms=0, min_level=0, max_level=3):
+    def __init__(self, geojsonfile, buffer_geoms=0, min_level=0, max_level=3, cache=False, find_cache_size=0):
         assert min_level <= max_level, "`min_level` <= `max_level'"
         self.min_level = min_level
         self.max_level = max_level
@@ -98,10 +156,28 @@ class NUTSfinder:
         self.buffer = buffer_geoms
 
         self.scale, self.year, self.epsg = self._parse_filename(geojsonfile)
-        self.regions = self._load_regions()
-        self.tree = self._construct_tree(self.regions)
+        self.regions = self._load_cached_regions() if cache else self._load_regions()
+        self._id2idx = {region.id: i for i, region in enumerate(self.regions)}
+        self._children = self._construct_tree(self.regions)
+
+        # arrays for vectorized queries
+        self._xmin, self._ymin, self._xmax, self._ymax = self._construct_bbox_arrays(self.regions)
+        self._strtree = self._construct_rtree(self._xmin, self._ymin, self._xmax, self._ymax)
+        self._is_max_level = np.array([region.level == self.max_level for region in self.regions], dtype=bool)
+        self._first_max_level = len(self.regions) - int(self._is_max_level.sum())     # regions are sorted by level
+
+        # the NUTS hierarchy is fixed, so the parents of each region are precomputed as indices into `self.regions`
+        self._parent_idx = [self._get_parent_idx(region) for region in self.regions]
+
+        # all regions of the highest level have the same number of parents, so their parents fit into one integer array (-1 for other levels)
+        self._parent_arr = np.full((len(self.regions), self.max_level - self.min_level), -1, dtype=np.intp)
+        for i in np.flatnonzero(self._is_max_level).tolist(): self._parent_arr[i] = self._parent_idx[i]
+
+        # optional lookup grid, see `build_grid`
+        self._grid = None
 
-        self.rtree = self._construct_rtree(self.regions)
+        # optional memoization of `find`
+        self._find_cached = lru_cache(maxsize=find_cache_size)(self._find) if find_cache_size else None
 
     def __getitem__(self, idx): return self.regions[idx]
 
@@ -129,7 +205,7 @@ class NUTSfinder:
         file = os.path.join(datadir, f"NUTS_RG_{scale:02d}M_{year}_{epsg}.geojson")
 
         if os.path.exists(file):
-            return cls(file)
+            return cls(file, **kwargs)
         else:
             return cls(download_NUTS(datadir, scale=scale, year=year, epsg=epsg), **kwargs)
 
@@ -139,8 +215,79 @@ class NUTSfinder:
         Find a point's NUTS regions by longitude and latitude.
         For large-scale applications, if it is known, that the point corresponds to a valid location within the NUTS regions, use `valid_point = True` for a speedup.
         """
-        results = self._find_rtree(lon, lat, self.regions, valid_point=valid_point)
-        return sorted(results)
+        if self._find_cached is not None:
+            # plain floats as cache keys, so that e.g. NumPy scalars are hashable and hit the same entries
+            return list(self._find_cached(float(lon), float(lat), valid_point))
+        return self._find(lon, lat, valid_point)
+
+    def find_many(self, lons, lats, valid_point=False) -> list:
+        """
+        Find the NUTS regions of many points at once, given by arrays of longitudes and latitudes.
+        Returns one sorted list of regions per point, i.e. the same as `[nf.find(lon, lat) for lon, lat in zip(lons, lats)]`.
+        For large numbers of points, this is considerably faster than repeated calls to `find`, as the point-in-polygon tests
+        of all points are performed in a single vectorized call.
+        """
+        lons = np.asarray(lons, dtype=np.float64).ravel()
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        assert lons.shape == lats.shape, "`lons` and `lats` must be of equal length"
+
+        if self._grid is None:
+            result_idx = self._find_many_idx(lons, lats, valid_point)
+        else:
+            # points in unambiguous grid cells are looked up directly, only the remaining ones are tested
+            leaves = self._lookup_grid_many(lons, lats)
+            if valid_point: leaves[leaves == _GRID_EMPTY] = _GRID_AMBIGUOUS
+            result_idx = [[*self._parent_idx[leaf], leaf] if leaf >= 0 else [] for leaf in leaves.tolist()]
+            unknown = np.flatnonzero(leaves == _GRID_AMBIGUOUS)
+            for i, idx in zip(unknown.tolist(), self._find_many_idx(lons[unknown], lats[unknown], valid_point)): result_idx[i] = idx
+
+        return [[self.regions[j] for j in sorted(set(idx))] for idx in result_idx]
+
+    def build_grid(self, resolution=0.05):
+        """
+        Rasterize the regions of the highest level into a regular lookup grid with cells of `resolution` degrees (or units of the NUTS file's CRS).
+        Grid cells, which lie in the interior of exactly one region and touch no other region, store this region. Cells, which touch no region,
+        are marked as empty. Points in such cells are then looked up by `find` and `find_many` directly, without any bbox or point-in-polygon tests.
+        Points in all other cells, i.e. close to the boundaries of the regions, are found as usual, so that the results do not change.
+
+        Building the grid requires intersection tests of all cells and takes a while, but pays off for large numbers of queries.
+        The memory consumption of the grid grows quadratically with `1/resolution`.
+        """
+        leaves = np.flatnonzero(self._is_max_level)
+        if not len(leaves): return
+        lon0, lat0 = self._xmin[leaves].min(), self._ymin[leaves].min()
+        # one additional row and column, so that all points outside of the grid lie outside of all bboxes despite rounding
+        shape = (int((self._ymax[leaves].max() - lat0) / resolution) + 2, int((self._xmax[leaves].max() - lon0) / resolution) + 2)
+
+        grid = np.full(shape, _GRID_AMBIGUOUS, dtype=np.min_scalar_type(-len(self.regions)))
+        n_touching = np.zeros(shape, dtype=np.int32)
+        eps = resolution * 1e-6     # points on the edge of a cell might be rounded into the neighboring cell, so cells are slightly enlarged
+        for i in leaves.tolist():
+            parents = list(self._parent_idx[i])
+
+            # rasterize each part of a region separately, as the bbox of e.g. a country with overseas territories is huge
+            for part in get_parts(self.regions[i].geom).tolist():
+                prepare(part)
+                xmin, ymin, xmax, ymax = part.bounds
+                rows, cols = np.meshgrid(np.arange(int((ymin - lat0) / resolution), int((ymax - lat0) / resolution) + 1),
+                                         np.arange(int((xmin - lon0) / resolution), int((xmax - lon0) / resolution) + 1), indexing="ij")
+                rows, cols = rows.ravel(), cols.ravel()
+                x, y = lon0 + cols * resolution, lat0 + rows * resolution
+                cells = box(x - eps, y - eps, x + resolution + eps, y + resolution + eps)
+
+                # parts of the same region touching a cell are counted separately, which only makes the grid more conservative
+                touching = intersects(part, cells)
+                n_touching[rows[touching], cols[touching]] += 1
+
+                # like `find`, only accept the region for a point if the bboxes of all its parents contain the point, too
+                inside = contains_properly(part, cells) \
+                    & (self._xmin[parents] <= x[:, None] - eps).all(axis=1) & (self._xmax[parents] >= x[:, None] + resolution + eps).all(axis=1) \
+                    & (self._ymin[parents] <= y[:, None] - eps).all(axis=1) & (self._ymax[parents] >= y[:, None] + resolution + eps).all(axis=1)
+                grid[rows[inside], cols[inside]] = i
+
+        grid[n_touching > 1] = _GRID_AMBIGUOUS
+        grid[n_touching == 0] = _GRID_EMPTY
+        self._grid, self._grid_origin, self._grid_resolution = grid, (lon0, lat0), resolution
 
     def find_geometry(self, geom):
         """Find NUTS regions overlapping with a geometry.
@@ -183,92 +330,234 @@ class NUTSfinder:
 
     # Utilities
     def _parse_filename(self, file):
-        try:
-            scale, year, epsg = re.search(r"NUTS_RG_(\d{,2})M_(\d+)_(\d+)", file).groups()
-        except:
+        match = _NUTS_RE.search(file)
+        if not match:
             raise ValueError(f"Input file {file} could not be parsed. Files must follow Eurostat's naming convention, e.g. NUTS_RG_<SCALE>M_<YEAR>_<EPSG>.geojson)")
+        scale, year, epsg = match.groups()
         return int(scale), int(year), int(epsg)
 
-    def _filter_regions(self, fc):
+    def _filter_regions(self, features):
         filtered = []
-        for feature in fc["features"]:
+        for feature in features:
             if self.min_level <= feature["properties"]["LEVL_CODE"] <= self.max_level:
                 filtered.append(feature)
 
-        regions = [NUTSregion(feature, self.buffer) for feature in filtered]
+        if self.buffer:
+            # buffered geometries are needed eagerly: construct and buffer all geometries at once
+            geoms = buffer(geometries2shapely([feature["geometry"] for feature in filtered]), self.buffer)
+            regions = [NUTSregion(feature, self.buffer, geom) for feature, geom in zip(filtered, geoms)]
+        else:
+            regions = [NUTSregion(feature, self.buffer) for feature in filtered]
         return regions
 
     def _load_regions(self):
-        with open(self.file, encoding='cp850') as f:
-            fc = json.load(f)
+        with open(self.file, "rb") as f:
+            if ijson is not None and (self.min_level > 0 or self.max_level < 3):
+                # stream the features, so that only those of the requested levels are held in memory
+                features = ijson.items(f, "features.item", use_float=True)
+            else:
+                # GeoJSON is UTF-8 encoded, use the faster `orjson` parser if installed
+                features = (orjson.loads(f.read()) if orjson is not None else json.load(f))["features"]
+            regions_filtered = self._filter_regions(features)
 
-        regions_filtered = self._filter_regions(fc)
-        return sorted(regions_filtered)
+        # same order as `NUTSregion.__lt__`, but the keys are only computed once per region
+        return sorted(regions_filtered, key=lambda region: (region.level, region.id))
 
-    def _construct_rtree(self, regions, indices=None, embed_obj=False):
+    def _load_cached_regions(self):
         """
-        Construct a fast R-tree based on the regions' bounding boxes.
+        Load the regions from the cache file, if it was created from the same NUTS file (by modification time and size) with the same settings.
+        Otherwise, load the regions from the NUTS file and (re)write the cache file.
+        """
+        # one cache file per NUTS file in the user's cache directory
+        path = os.path.abspath(self.file)
+        cachedir = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "fastpynuts")
+        cachefile = os.path.join(cachedir, f"{os.path.basename(path)}.{hashlib.sha256(path.encode()).hexdigest()[:16]}.pkl")
+        stat = os.stat(self.file)
+        key = (_CACHE_VERSION, stat.st_mtime_ns, stat.st_size, self.min_level, self.max_level, self.buffer)
+
+        try:
+            # unpickling may execute code, only load cache files written by the current user
+            if not hasattr(os, "getuid") or os.stat(cachefile).st_uid == os.getuid():
+                with open(cachefile, "rb") as f:
+                    cached_key, regions = pickle.load(f)
+                if cached_key == key: return regions
+        except Exception:
+            pass    # missing or outdated cache, rebuild below
+
+        regions = self._load_regions()
+        try:
+            # write to a temporary file first and move it into place, so that concurrent writers can't leave a partial cache file
+            os.makedirs(cachedir, mode=0o700, exist_ok=True)
+            fd, tmpfile = tempfile.mkstemp(dir=cachedir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump((key, regions), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmpfile, cachefile)
+            except BaseException:
+                os.remove(tmpfile)
+                raise
+        except OSError:
+            pass    # the cache is only an optimization, e.g. the cache directory may be read-only
+        return regions
 
-        Indices should refer to the indices of the region objects in `self.regions`. They will be used to retrieve
-        the region objects from the indices returned by `rtree.index.Index.intersection()`.
+    def _construct_rtree(self, xmin, ymin, xmax, ymax):
+        """
+        Construct a fast R-tree based on the regions' bounding boxes, given as arrays. The `shapely.STRtree` is packed in a
+        single call and queried directly in GEOS, also for many geometries at once. Queries return indices into `self.regions`.
+        """
+        return STRtree(box(xmin, ymin, xmax, ymax))
 
-        Optionally embed the region objects in the rtree nodes. This has negative runtime implications.
+    def _construct_bbox_arrays(self, regions):
         """
-        idx = index.Index()
-        for i, region in zip(indices or range(len(regions)), regions):
-            if embed_obj:
-                idx.insert(id=i, coordinates=region.bbox, obj=region)
-            else:
-                idx.insert(id=i, coordinates=region.bbox)
-        return idx
+        Split the regions' bounding boxes into four contiguous arrays `xmin, ymin, xmax, ymax` (structure of arrays).
+        This allows for fast vectorized point-in-bbox tests of all regions at once.
+        """
+        bboxes = np.array([region.bbox for region in regions], dtype=np.float64).reshape(-1, 4)
+        return tuple(np.ascontiguousarray(coords) for coords in bboxes.T)
 
     def _construct_tree(self, regions):
-        """Construct a tree, whose nodes contain NUTSregion objects. This way, the hierarchical structure of the NUTS regions can be exploited."""
+        """
+        Construct the NUTS hierarchy as a mapping from a region's ID to its child regions. This way, the hierarchical structure of the NUTS regions can be exploited.
+        The regions of `min_level` are the children of `"root"`.
+        """
+        children = defaultdict(list)
+        for region in regions:
+            parent = "root" if region.level == self.min_level else region.id[:-1]
+            children[parent].append(region)
+        return dict(children)
 
-        tree = Tree()
-        tree.create_node(tag="NUTS", identifier="root")
-        for i, region in enumerate(regions):
-            if region.level == self.min_level:
-                tree.create_node(tag=str(region), identifier=region.id, parent="root", data=region)
-            else:
-                parent = region.id[:-1]
-                tree.create_node(tag=str(region), identifier=region.id, parent=parent, data=region)
+    def _get_parent_idx(self, region):
+        """
+        Get the indices of a region's parents, ordered from the direct parent to the region of `min_level`.
+        NUTS IDs encode the full ancestry, the parent IDs are the region's own ID without the last one, two, ... characters.
+        """
+        return tuple(self._id2idx[region.id[:-k]] for k in range(1, region.level - self.min_level + 1))
 
-        return tree
 
-    def _get_parents(self, id):
-        """Get the parent regions of a region from `self.tree`."""
-        parents = []
-        current_id = id
-        while parent_region := self.tree.parent(current_id).data:
-            parents.append(parent_region)
-            current_id = parent_region.id
-        return parents
+    # finding utilities
+    def _find(self, lon, lat, valid_point):
+        """Implementation of `find`."""
+        if self._grid is not None:
+            leaf = self._lookup_grid(lon, lat)
+            if leaf >= 0: return [self.regions[i] for i in sorted((*self._parent_idx[leaf], leaf))]
+            if leaf == _GRID_EMPTY and not valid_point: return []
 
+        # sort the indices rather than the regions, which avoids the comparisons of `NUTSregion.__lt__`
+        return [self.regions[i] for i in sorted(self._find_soa_idx(lon, lat, valid_point))]
 
-    # finding utilities
     def _find_rtree(self, lon, lat, *args, valid_point=False):
         """Find point's regions fast using a R-tree."""
-        hits = self._candidates_rtree(lon, lat, self.regions)
+        hits = self._candidates_rtree(Point(lon, lat))
         hits = self._maybe_validate(lon, lat, hits, valid_point)
-        return hits
+        return [self.regions[i] for i in hits]
+
+    def _find_soa(self, lon, lat, *args, valid_point=False):
+        """
+        Find point's regions fast using a vectorized test against all bounding boxes.
+        The validation of `_validate_candidate_set` is fused into a single pass over the candidates of the highest level, stopping
+        at the first valid one if no buffer is used.
+        """
+        return [self.regions[i] for i in self._find_soa_idx(lon, lat, valid_point)]
+
+    def _find_soa_idx(self, lon, lat, valid_point):
+        """Implementation of `_find_soa`. Returns the indices of the found regions."""
+        cand_idx = self._candidates_soa(lon, lat)
+        if not cand_idx: return []
+        if valid_point and len(cand_idx) == self.max_level - self.min_level + 1:
+            return cand_idx
+
+        # candidates are sorted like `self.regions`, i.e. by level, so the ones of the highest level come last
+        cand_set = set(cand_idx)
+        validated = []
+        for i in cand_idx[bisect_left(cand_idx, self._first_max_level):]:
+            parents = self._parent_idx[i]
+            if cand_set.issuperset(parents) and intersects_xy(self.regions[i].geom, lon, lat):
+                validated.extend([*parents, i])
+                if not self.buffer: break
+        return list(dict.fromkeys(validated))
+
+    def _find_many_idx(self, lons, lats, valid_point):
+        """Implementation of `find_many` without the grid lookup. Returns the indices of the regions of each point."""
+        # gather the candidate regions of all points in one flat array by a single bulk query of the bbox tree, sorted by point and region
+        point_idx, cand_idx = self._strtree.query(points(lons, lats))
+        order = np.lexsort((cand_idx, point_idx))
+        point_idx, cand_idx = point_idx[order], cand_idx[order]
+        counts = np.bincount(point_idx, minlength=len(lons))
+
+        # points with the expected number of candidates are accepted without validation due to `valid_point`
+        expected_hits = self.max_level - self.min_level + 1
+        accept = valid_point & (counts == expected_hits)
+        offsets = np.concatenate(([0], np.cumsum(counts))).tolist()
+        result_idx = [cand_idx[offsets[i]:offsets[i+1]].tolist() if accept[i] else [] for i in range(len(lons))]
+
+        # otherwise, only complete candidates of the highest level need a point-in-polygon test, which is done in a single vectorized call
+        test = self._complete_candidates(point_idx, cand_idx) & ~np.repeat(accept, counts)
+        geoms = np.array([self.regions[i].geom for i in cand_idx[test].tolist()], dtype=object)
+        inside = intersects_xy(geoms, lons[point_idx[test]], lats[point_idx[test]])
+        hits, leaves = point_idx[test][inside], cand_idx[test][inside]
+
+        # without buffer, at max one full set of regions can be found, take the first one like `_validate_candidate_set`
+        if not self.buffer:
+            hits, first = np.unique(hits, return_index=True)
+            leaves = leaves[first]
+        for i, leaf in zip(hits.tolist(), leaves.tolist()):
+            result_idx[i].extend((*self._parent_idx[leaf], leaf))
+
+        return result_idx
 
     def _find_rtree_geom(self, geom, *args):
         """Find polygon's regions fast using a R-tree."""
         if not is_geometry(geom):
             geom = geometry2shapely(geom)
-        lon_min, lat_min, lon_max, lat_max = geom.bounds
-        hits = self._candidates_rtree(lon_min, lat_min, self.regions, lon_max=lon_max, lat_max=lat_max)
+        hits = self._candidates_rtree(geom)
         hits = self._validate_geometry(geom, hits)
-        return hits
+        return [self.regions[i] for i in hits]
+
+    def _candidates_rtree(self, geom):
+        """Determine the indices of the candidate regions, whose bounding boxes intersect the bounding box of `geom`, sorted like `self.regions`."""
+        return np.sort(self._strtree.query(geom)).tolist()
+
+    def _candidates_soa(self, lon, lat):
+        """Determine the indices of the candidate regions by a vectorized point-in-bbox test."""
+        return np.nonzero(self._bbox_mask(lon, lat))[0].tolist()
+
+    def _lookup_grid(self, lon, lat):
+        """Look up the region of a point in the grid of `build_grid`. Returns the region's index, `_GRID_AMBIGUOUS` or `_GRID_EMPTY`."""
+        lon0, lat0 = self._grid_origin
+        row, col = (lat - lat0) / self._grid_resolution, (lon - lon0) / self._grid_resolution
+        if 0 <= row < self._grid.shape[0] and 0 <= col < self._grid.shape[1]:
+            return int(self._grid[int(row), int(col)])
+        return _GRID_EMPTY
+
+    def _lookup_grid_many(self, lons, lats):
+        """Vectorized version of `_lookup_grid` for arrays of points."""
+        lon0, lat0 = self._grid_origin
+        rows, cols = (lats - lat0) / self._grid_resolution, (lons - lon0) / self._grid_resolution
+        valid = (rows >= 0) & (rows < self._grid.shape[0]) & (cols >= 0) & (cols < self._grid.shape[1])
+        leaves = np.full(len(lons), _GRID_EMPTY, dtype=np.intp)
+        leaves[valid] = self._grid[rows[valid].astype(np.intp), cols[valid].astype(np.intp)]
+        return leaves
+
+    def _bbox_mask(self, lon, lat):
+        """Test the point `(lon, lat)` against all bounding boxes. Returns a boolean mask of shape `(n_regions,)`, aligned with `self.regions`."""
+        return (self._xmin <= lon) & (self._xmax >= lon) & (self._ymin <= lat) & (self._ymax >= lat)
+
+    def _complete_candidates(self, point_idx, cand_idx):
+        """
+        Vectorized version of the parent check of `_validate_candidate_set` for the flat candidate arrays of many points, sorted by point and region.
+        Returns a mask of the candidates of the highest level, whose parents are all candidates of the same point, too.
+        """
+        # encode (point, region) pairs as single integers, which are sorted like the candidates
+        n_regions = len(self.regions)
+        keys = point_idx * n_regions + cand_idx
 
-    def _candidates_rtree(self, lon_min, lat_min, regions, lon_max=None, lat_max=None):
-        """Determine the candidate regions by R-tree intersection with a point or rectangle."""
-        if lon_max is None: lon_max = lon_min
-        if lat_max is None: lat_max = lat_min
+        cand_max = np.flatnonzero(self._is_max_level[cand_idx])
+        queries = point_idx[cand_max, None] * n_regions + self._parent_arr[cand_idx[cand_max]]
+        pos = np.minimum(np.searchsorted(keys, queries), max(len(keys) - 1, 0))
 
-        hits = [regions[i] for i in self.rtree.intersection((lon_min, lat_min, lon_max, lat_max))]
-        return hits
+        complete = np.zeros(len(cand_idx), dtype=bool)
+        complete[cand_max] = (keys[pos] == queries).all(axis=1)
+        return complete
 
     def _maybe_validate(self, lon, lat, hits, valid_point, expected_hits=None, validation_method="_validate_candidate_set"):
         """
@@ -286,37 +575,44 @@ class NUTSfinder:
         else:
             return validate(lon, lat, hits)
 
-    def _validate_candidate_set(self, lon, lat, hits):
+    def _validate_candidate_set(self, lon, lat, cand_idx):
         """
         In case of bbox candidate selection, wrong candidates with overlapping bbboxes may be suggested. For NUTS,
         we expect all parent regions to be included in the candidate set. If the parent regions are missing, we can safely discard
         regions and avoid an unnecessary point-in-polyon test. If no buffer is used, at max one full set of regions can be found.
         If a buffer is applied to the regions, boundary points might coincide with multiple regions.
+
+        The candidates `cand_idx` as well as the returned regions are given as indices into `self.regions`.
         """
+        if not cand_idx: return []
+        cand_set = set(cand_idx)
 
-        max_levels = [hit for hit in hits if hit.level == self.max_level]
         validated = []
-        for region in max_levels:
-            parents = self._get_parents(region.id)
-            if all([p in hits for p in parents]) and intersects_xy(region.geom, lon, lat):
-                validated.extend([*parents, region])
+        for i in cand_idx:
+            if not self._is_max_level[i]: continue
+            parents = self._parent_idx[i]
+            if cand_set.issuperset(parents) and intersects_xy(self.regions[i].geom, lon, lat):
+                validated.extend([*parents, i])
                 if not self.buffer: return validated
 
-        validated = np.unique(validated).tolist()
+        validated = list(dict.fromkeys(validated))
         return validated
 
-    def _validate_geometry(self, geom, hits):
+    def _validate_geometry(self, geom, cand_idx):
         """
         The bounding boxes of a queried polygon might overlap with more regions, than the polygon does.
         Therefore, all candidate regions are checked via a polygon intersection test, by testing all regions of the highest level.
+
+        Like in `_validate_candidate_set`, candidates and returned regions are given as indices into `self.regions`.
         """
+        cand_set = set(cand_idx)
 
-        max_levels = [hit for hit in hits if hit.level == self.max_level]
         validated = []
-        for region in max_levels:
-            parents = self._get_parents(region.id)
-            if all([p in hits for p in parents]) and intersects(region.geom, geom):
-                validated.extend([*parents, region])
+        for i in cand_idx:
+            if not self._is_max_level[i]: continue
+            parents = self._parent_idx[i]
+            if cand_set.issuperset(parents) and intersects(self.regions[i].geom, geom):
+                validated.extend([*parents, i])
 
-        validated = np.unique(validated).tolist()
+        validated = list(dict.fromkeys(validated))
         return validated
@@ -2,6 +2,8 @@
 Contains miscellaneous utilities.
 """
 
+import numpy as np
+from shapely import linearrings, multipolygons, polygons
 from shapely.geometry import shape
 from shapely.errors import GeometryTypeError
 
@@ -24,3 +26,39 @@ def geometry2shapely(geometry):
         poly = shape(geometry["geometry"])
 
     return poly
+
+
+def geometries2shapely(geometries):
+    """
+    Vectorized version of `geometry2shapely` for a sequence of GeoJSON-like geometries: the rings of all geometries are collected
+    into a single coordinate array, from which all `shapely` geometries are constructed in a few calls. Returns an array of geometries.
+
+    Supported geometry types:
+    - Polygon
+    - MultiPolygon
+    """
+    coords, ring2polygon, polygon2geometry = [], [], []
+    is_multi = np.zeros(len(geometries), dtype=bool)
+    for i, geometry in enumerate(geometries):
+        is_multi[i] = geometry["type"] == "MultiPolygon"
+        for polygon in (geometry["coordinates"] if is_multi[i] else [geometry["coordinates"]]):
+            for ring in polygon:
+                coords.append(np.asarray(ring, dtype=np.float64))
+                ring2polygon.append(len(polygon2geometry))
+            polygon2geometry.append(i)
+
+    geoms = np.empty(len(geometries), dtype=object)
+    if not coords: return geoms
+
+    # the first ring of each polygon is its shell, the following rings are its holes
+    ring2coords = np.repeat(np.arange(len(coords)), [len(ring) for ring in coords])
+    polys = polygons(linearrings(np.concatenate(coords), indices=ring2coords), indices=ring2polygon)
+
+    # Polygons consist of a single polygon, the polygons of MultiPolygons are collected
+    polygon2geometry = np.asarray(polygon2geometry)
+    single = ~is_multi[polygon2geometry]
+    geoms[polygon2geometry[single]] = polys[single]
+    if is_multi.any():
+        multi_idx = np.cumsum(is_multi) - 1     # index of each MultiPolygon among all MultiPolygons
+        geoms[is_multi] = multipolygons(polys[~single], indices=multi_idx[polygon2geometry[~single]])
+    return geoms
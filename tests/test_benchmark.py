@@ -1,7 +1,31 @@
 import pytest
+from shapely import get_coordinates
 from .fixtures import *
 
+from fastpynuts import experimental
 
-@pytest.mark.parametrize("method", ["rtree", "rtree_obj", "tree", "tree_rtree", "tree_rtree_obj", "bbox"])
+requires_rtree = pytest.mark.skipif(experimental.index is None, reason="requires the optional dependency rtree")
+
+
+@pytest.mark.parametrize("method", [
+    "soa", "rtree", pytest.param("rtree_obj", marks=requires_rtree), "tree", "tree_rtree",
+    pytest.param("tree_rtree_obj", marks=requires_rtree), "bbox"
+])
 def test_methods(nfb20, method, points_inside):
-    for point in points_inside[nfb20.scale]: assert nfb20.find(*point, method=method) == nfb20.find(*point, method="poly")
\ No newline at end of file
+    for point in points_inside[nfb20.scale]: assert nfb20.find(*point, method=method) == nfb20.find(*point, method="poly")
+
+
+# are valid points found like by `NUTSfinder.find`, also close to the boundaries, where the bboxes of several children overlap?
+@pytest.mark.parametrize("method", ["tree", "tree_rtree", pytest.param("tree_rtree_obj", marks=requires_rtree)])
+def test_valid_point_boundary(nf20, nfb20, method):
+    points = []
+    for region in nfb20.regions[nfb20._first_max_level:]:
+        interior = region.geom.representative_point()
+        points.append((interior.x, interior.y))
+        for x, y in get_coordinates(region.geom)[:3].tolist():
+            points.extend([(x + 1e-4, y), (x - 1e-4, y), (x, y + 1e-4), (x, y - 1e-4)])
+
+    n_levels = nfb20.max_level - nfb20.min_level + 1
+    valid_points = [point for point in points if len(nf20.find(*point)) == n_levels]
+    assert any(len(nfb20._candidates_soa(*point)) > n_levels for point in valid_points)
+    for point in valid_points: assert nfb20.find(*point, method=method, valid_point=True) == nf20.find(*point)
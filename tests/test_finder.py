@@ -1,3 +1,5 @@
+import os
+import numpy as np
 import pytest
 from .fixtures import *
 
@@ -15,6 +17,12 @@ def test_wrong_level(tmp_path, min_level, max_level):
     with pytest.raises(AssertionError): NUTSfinder.from_web(scale=20, datadir=tmp_path, min_level=min_level, max_level=max_level)
 
 
+# catch files not following Eurostat's naming convention
+@pytest.mark.parametrize("file", ["regions.geojson", "NUTS_RG_M_2021_4326.geojson", "NUTS_RG_100M_2021_4326.geojson"])
+def test_wrong_filename(file):
+    with pytest.raises(ValueError): NUTSfinder(file)
+
+
 # does the NUTSfinder return the expected number of regions?
 @pytest.mark.parametrize("min_level,max_level", levels_valid)
 def test_n_find(tmp_path, min_level, max_level, points_inside):
@@ -22,6 +30,58 @@ def test_n_find(tmp_path, min_level, max_level, points_inside):
     for point in points_inside[nf.scale]: assert len(nf.find(*point)) == nf.max_level - nf.min_level + 1
 
 
+# does the batched query return the same regions as single queries?
+@pytest.mark.parametrize("valid_point", [False, True])
+def test_find_many(nf20, valid_point):
+    points = load_random_points(scale=20, N=10, suffix="_inside") + load_random_points(scale=20, N=1000, suffix="_outside")
+    lons, lats = np.array(points).T
+    assert nf20.find_many(lons, lats, valid_point=valid_point) == [nf20.find(*point, valid_point=valid_point) for point in points]
+
+
+# does the lookup grid leave the results unchanged?
+@pytest.mark.parametrize("valid_point", [False, True])
+@pytest.mark.parametrize("buffer_geoms", [0, 1e-5])
+def test_grid(nf20, valid_point, buffer_geoms):
+    nf = NUTSfinder(nf20.file, buffer_geoms=buffer_geoms)
+    nf_grid = NUTSfinder(nf20.file, buffer_geoms=buffer_geoms)
+    nf_grid.build_grid(resolution=0.1)
+    points = load_random_points(scale=20, N=10, suffix="_inside") + load_random_points(scale=20, N=1000, suffix="_outside")
+    lons, lats = np.array(points).T
+    expected = [nf.find(*point, valid_point=valid_point) for point in points]
+    assert [nf_grid.find(*point, valid_point=valid_point) for point in points] == expected
+    assert nf_grid.find_many(lons, lats, valid_point=valid_point) == expected
+
+
+# does the memoization of `find` return the same regions?
+def test_find_cache(nf20):
+    nf_cached = NUTSfinder(nf20.file, find_cache_size=16)
+    points = load_random_points(scale=20, N=10, suffix="_inside")[:4] + load_random_points(scale=20, N=1000, suffix="_outside")[:4]
+    for point in points: assert nf_cached.find(*point) == nf20.find(*point)
+
+    # the repeated queries are answered from the cache
+    hits = nf_cached._find_cached.cache_info().hits
+    for point in points: assert nf_cached.find(*point) == nf20.find(*point)
+    assert nf_cached._find_cached.cache_info().hits == hits + len(points)
+
+    # returned lists are copies, mutating them does not alter the cached results
+    nf_cached.find(*points[0]).clear()
+    assert nf_cached.find(*points[0]) == nf20.find(*points[0])
+
+    # NumPy scalars are accepted like on the uncached path
+    assert nf_cached.find(np.array(points[0][0]), np.float64(points[0][1])) == nf20.find(*points[0])
+
+
+# does a finder restored from the cache behave like a freshly loaded one?
+@pytest.mark.parametrize("buffer_geoms", [0, 1e-5])
+def test_cache(tmp_path, monkeypatch, buffer_geoms, points_inside):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    nf = NUTSfinder.from_web(scale=20, datadir=tmp_path, buffer_geoms=buffer_geoms, cache=True)
+    nf_cached = NUTSfinder.from_web(scale=20, datadir=tmp_path, buffer_geoms=buffer_geoms, cache=True)
+    assert len(os.listdir(tmp_path / "cache" / "fastpynuts")) == 1
+    assert [region.properties for region in nf_cached.regions] == [region.properties for region in nf.regions]
+    for point in points_inside[nf.scale]: assert nf_cached.find(*point) == nf.find(*point)
+
+
 @pytest.mark.parametrize("method", ["rtree"])
 class TestPoints:
     # does the finder find all regions correctly?
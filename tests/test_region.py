@@ -1,4 +1,7 @@
 import pytest
+from shapely import equals_exact
+
+from fastpynuts.utils import geometries2shapely, geometry2shapely
 
 from .utils import get_regions
 
@@ -9,3 +12,20 @@ def test_geo_interface(region):
 @pytest.mark.parametrize("regions", [get_regions()])
 def test_sorted(regions):
     assert [str(reg) for reg in sorted(regions)] == sorted([str(reg) for reg in regions])
+
+@pytest.mark.parametrize("region", get_regions())
+def test_attributes(region):
+    assert region.id == region.properties["NUTS_ID"]
+    assert region.level == region.properties["LEVL_CODE"]
+    assert region.type == region.feature["geometry"]["type"]
+
+@pytest.mark.parametrize("regions", [get_regions()])
+def test_hash(regions):
+    assert len(set(regions + regions)) == len(regions)
+
+@pytest.mark.parametrize("regions", [get_regions()])
+def test_geometries2shapely(regions):
+    geoms = geometries2shapely([region.feature["geometry"] for region in regions])
+    for region, geom in zip(regions, geoms):
+        assert geom.geom_type == region.type
+        assert equals_exact(geom, geometry2shapely(region.feature), 0)